@@ -0,0 +1,156 @@
+# aggregates.py
+# Incremental aggregation of the survey tables: every table is built from partial counts that are
+# merged chunk by chunk, so the in-memory frames and the chunked CSV readers share one code path
+
+import itertools
+import numpy as np
+import pandas as pd
+from platforms import breakdown_series, build_platform_matrix, platform_breakdown
+from scoring import count_by_group, encode_groups, negative_flags, summary_frame, NEGATIVE_THRESHOLD
+from survey_cache import LIKERT_DTYPE, SCORE_MAP, likert_columns
+
+DEFAULT_CHUNKSIZE = 100_000
+ANXIETY_THRESHOLD = 4  # smmh worry scale, 1-5
+DEPRESSION_THRESHOLD = 3  # smmh depression scale, 1-5
+
+
+def _accumulate(total, partial):
+    return partial if total is None else total.add(partial, fill_value=0)
+
+
+def _counts(total):
+    return total.sort_index().astype(np.int64)
+
+
+def _observed(counts, index):
+    keep = counts > 0
+    return pd.Series(counts[keep], index=index[keep])
+
+
+def counted(chunks, record, key='rows_in'):
+    """Pass `chunks` through, adding their row counts to `record[key]` (e.g. a run-manifest stage record)."""
+    for chunk in chunks:
+        record[key] = record.get(key, 0) + len(chunk)
+        yield chunk
+
+
+# --- Mental health survey ---
+
+def read_mental_health_chunks(path, state_col, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield chunks holding only the Likert columns and `state_col`, relabelled with the question text.
+
+    Likert columns are detected on the first chunk, so a PHQ-9/GAD-7 item has to be answered at
+    least once there to be picked up.
+    """
+    labels = pd.read_csv(path, nrows=1, dtype=str).iloc[0]
+    export_names = {}
+    for name, label in labels.items():
+        export_names.setdefault(label, name)
+    sample = pd.read_csv(path, skiprows=[1, 2], nrows=chunksize, dtype=str)
+    likert = [name for name in sample.columns if sample[name].isin(SCORE_MAP.keys()).any()]
+    state = export_names[state_col]
+    del sample
+    dtypes = {name: LIKERT_DTYPE for name in likert}
+    dtypes[state] = str
+    reader = pd.read_csv(path, skiprows=[1, 2], usecols=likert + [state], dtype=dtypes, chunksize=chunksize)
+    for chunk in reader:
+        chunk.columns = [labels[name] for name in chunk.columns]
+        yield chunk
+
+
+def aggregate_state_summary(chunks, phq9_cols, gad7_cols, state_col, phq9_threshold=NEGATIVE_THRESHOLD,
+                            gad7_threshold=NEGATIVE_THRESHOLD):
+    """Merge per-chunk PHQ-9/GAD-7 counts by state into the same table as `scoring.score_by_state`."""
+    total = None
+    for chunk in chunks:
+        negative = negative_flags(chunk, phq9_cols, gad7_cols, phq9_threshold, gad7_threshold)
+        group_codes, labels = encode_groups(chunk[state_col])
+        totals, counts = count_by_group(group_codes, len(labels), negative)
+        partial = pd.DataFrame({'total': totals, 'PHQ9': counts[:, 0], 'GAD7': counts[:, 1]},
+                               index=pd.Index(np.asarray(labels), dtype=object))
+        total = _accumulate(total, partial)
+    total = _counts(total)
+    return summary_frame(total.index, total['total'].to_numpy(), total[['PHQ9', 'GAD7']].to_numpy(),
+                         ['PHQ9', 'GAD7'], state_col)
+
+
+def stream_state_summary(path, state_col, chunksize=DEFAULT_CHUNKSIZE, phq9_threshold=NEGATIVE_THRESHOLD,
+                         gad7_threshold=NEGATIVE_THRESHOLD, record=None):
+    """Per-state summary of the mental health CSV at `path`, read `chunksize` rows at a time.
+
+    The rows read are added to `record['rows_in']` when a `record` is given.
+    """
+    chunks = read_mental_health_chunks(path, state_col, chunksize)
+    if record is not None:
+        chunks = counted(chunks, record)
+    first_chunk = next(chunks)
+    likert_cols = likert_columns(first_chunk)
+    return aggregate_state_summary(itertools.chain([first_chunk], chunks), likert_cols[:9], likert_cols[9:], state_col,
+                                   phq9_threshold, gad7_threshold)
+
+
+# --- Social media survey ---
+
+def read_smmh_chunks(path, time_col, platform_col, depression_col, anxiety_col, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield chunks of the four smmh columns the report uses."""
+    dtypes = {time_col: str, platform_col: str, depression_col: 'float32', anxiety_col: 'float32'}
+    yield from pd.read_csv(path, usecols=list(dtypes), dtype=dtypes, chunksize=chunksize)
+
+
+def _severity_breakdown(matrix, scores, rows):
+    codes, labels = encode_groups(scores.where(rows).astype('Int64'))
+    counts = platform_breakdown(matrix, codes, len(labels), rows)
+    return breakdown_series(counts, np.asarray(labels, dtype=np.int64), matrix.platforms, [scores.name, 'platform'])
+
+
+def aggregate_smmh(chunks, time_col, platform_col, depression_col, anxiety_col,
+                   anxiety_threshold=ANXIETY_THRESHOLD, depression_threshold=DEPRESSION_THRESHOLD):
+    """Accumulate the bar chart, heatmap and conclusion counts over `chunks`.
+
+    Returns a dict with `total_counts`, `platform_counts`, `depression_counts`, `anxiety_counts`
+    (long form, one row per severity/platform pair) and `conclusion_summary`, whose `attrs` record
+    the thresholds its rates were computed at.
+    """
+    totals = mentions = by_platform = depression = anxiety = conclusion = None
+    for chunk in chunks:
+        # One platform index per chunk, shared by the bar chart and heatmap breakdowns
+        matrix = build_platform_matrix(chunk[platform_col])
+        has_platform = chunk[platform_col].notna().to_numpy()
+
+        # Bar chart: platforms per usage-time bin
+        time_codes, time_labels = encode_groups(chunk[time_col])
+        usage_rows = has_platform & (time_codes >= 0)
+        usage = platform_breakdown(matrix, time_codes, len(time_labels), usage_rows)
+        by_platform = _accumulate(by_platform, breakdown_series(usage, time_labels, matrix.platforms, [time_col, 'platform']))
+        time_index = pd.Index(np.asarray(time_labels), name=time_col)
+        totals = _accumulate(totals, _observed(np.bincount(time_codes[usage_rows], minlength=len(time_labels)), time_index))
+        mentions = _accumulate(mentions, _observed(usage.sum(axis=1), time_index))
+
+        # Heatmap: platforms per severity level
+        severity_rows = has_platform & chunk[[depression_col, anxiety_col]].notna().all(axis=1).to_numpy()
+        depression = _accumulate(depression, _severity_breakdown(matrix, chunk[depression_col], severity_rows))
+        anxiety = _accumulate(anxiety, _severity_breakdown(matrix, chunk[anxiety_col], severity_rows))
+
+        # Conclusion: negative rates per usage-time bin
+        scores = chunk[[time_col, depression_col, anxiety_col]].dropna()
+        flags = pd.DataFrame({'Total_Respondents': 1,
+                              'GAD7_Negative': (scores[anxiety_col] >= anxiety_threshold).astype(np.int64),
+                              'PHQ9_Negative': (scores[depression_col] >= depression_threshold).astype(np.int64)})
+        conclusion = _accumulate(conclusion, flags.groupby(scores[time_col], observed=True).sum())
+
+    total_counts = _counts(totals).reset_index(name='total')
+    platform_counts = _counts(by_platform).reset_index(name='count')
+    platform_counts = platform_counts.merge(total_counts, on=time_col)
+    platform_counts = platform_counts.merge(_counts(mentions).reset_index(name='total_platform_mentions'), on=time_col)
+    platform_counts['scaled'] = (platform_counts['count'] / platform_counts['total_platform_mentions']) * platform_counts['total']
+    conclusion_summary = _counts(conclusion).reset_index()
+    conclusion_summary['Anxiety_Rate'] = (conclusion_summary['GAD7_Negative'] / conclusion_summary['Total_Respondents']) * 100
+    conclusion_summary['Depression_Rate'] = (conclusion_summary['PHQ9_Negative'] / conclusion_summary['Total_Respondents']) * 100
+    conclusion_summary.attrs = {'anxiety_threshold': anxiety_threshold, 'depression_threshold': depression_threshold}
+    return {
+        'total_counts': total_counts,
+        'platform_counts': platform_counts,
+        'depression_counts': _counts(depression).reset_index(name='count'),
+        'anxiety_counts': _counts(anxiety).reset_index(name='count'),
+        'conclusion_summary': conclusion_summary,
+    }
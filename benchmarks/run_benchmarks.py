@@ -0,0 +1,159 @@
+# benchmarks/run_benchmarks.py
+# Times and memory-profiles each stage of the report pipeline on synthetic data at several scales.
+#
+#   python benchmarks/run_benchmarks.py --scales 10 100 1000 --output benchmarks/results.json
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+import plotly
+from aggregates import aggregate_smmh, read_smmh_chunks, stream_state_summary
+from benchmarks.synthetic import MENTAL_HEALTH_HEADER_ROWS, source_rows, synthesize_mental_health, synthesize_smmh
+from report import prepare_tables, render_sections, write_page
+from scoring import score_by_state
+from stages import max_rss_bytes
+from survey_cache import (ANXIETY_COL, DEPRESSION_COL, MENTAL_HEALTH_PATH, PLATFORM_COL, SMMH_PATH, STATE_COL, TIME_COL,
+                          likert_columns, load_census_regions, load_mental_health, load_smmh)
+
+SMMH_COLS = (TIME_COL, PLATFORM_COL, DEPRESSION_COL, ANXIETY_COL)
+
+
+def measure(func, repeat=1, memory=True):
+    """Run `func` `repeat` times for timing, then once under tracemalloc for its peak allocation."""
+    runs = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        runs.append(time.perf_counter() - start)
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, {'seconds': min(runs), 'runs': runs, 'peak_alloc_bytes': peak, 'max_rss_bytes': max_rss_bytes()}
+
+
+def render_report(tables, path, output):
+    # Same render and write steps as SocialMediaVisualizations.main(), serially and without the section cache
+    results = render_sections(tables, jobs=1, output=output)
+    return write_page(path, {name: fragment for name, (fragment, _) in results.items()}, output)
+
+
+def run_scale(scale, workdir, repeat, memory, chunksize):
+    """Generate inputs at `scale` x the real row counts and benchmark every stage on them."""
+    mental_health_path = os.path.join(workdir, 'mental_health.csv')
+    smmh_path = os.path.join(workdir, 'smmh.csv')
+    cache_dir = os.path.join(workdir, 'cache')
+    rows = {'mental_health': scale * source_rows(MENTAL_HEALTH_PATH, MENTAL_HEALTH_HEADER_ROWS),
+            'smmh': scale * source_rows(SMMH_PATH)}
+    synthesize_mental_health(mental_health_path, rows['mental_health'], seed=scale)
+    synthesize_smmh(smmh_path, rows['smmh'], seed=scale)
+    stages = {}
+
+    def load():
+        return (load_mental_health(mental_health_path, cache_dir), load_smmh(smmh_path, cache_dir),
+                load_census_regions(cache_dir=cache_dir))
+
+    def load_cold():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        return load()
+
+    (mental_health, smmh, census_regions), stages['load_csv'] = measure(load_cold, repeat, memory)
+    _, stages['load_cache'] = measure(load, repeat, memory)
+
+    likert_cols = likert_columns(mental_health)
+    state_summary, stages['score'] = measure(
+        lambda: score_by_state(mental_health, likert_cols[:9], likert_cols[9:], STATE_COL), repeat, memory)
+    tables, stages['aggregate'] = measure(
+        lambda: prepare_tables(state_summary, census_regions, aggregate_smmh([smmh], *SMMH_COLS)), repeat, memory)
+
+    def stream():
+        return (stream_state_summary(mental_health_path, STATE_COL, chunksize),
+                aggregate_smmh(read_smmh_chunks(smmh_path, *SMMH_COLS, chunksize), *SMMH_COLS))
+
+    _, stages['stream'] = measure(stream, repeat, memory)
+
+    output_bytes = {}
+    for output in ('inline', 'compact'):
+        report_path = os.path.join(workdir, f'report_{output}.html')
+        _, stages['html_' + output] = measure(lambda: render_report(tables, report_path, output), repeat, memory)
+        output_bytes[output] = os.path.getsize(report_path)
+
+    return {
+        'scale': scale,
+        'rows': rows,
+        'input_bytes': {'mental_health': os.path.getsize(mental_health_path), 'smmh': os.path.getsize(smmh_path)},
+        'output_bytes': output_bytes,
+        'stages': stages,
+    }
+
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'versions': {'numpy': np.__version__, 'pandas': pd.__version__, 'plotly': plotly.__version__},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the report pipeline on synthetic survey data.')
+    parser.add_argument('--scales', type=int, nargs='+', default=[10, 100],
+                        help='row-count multipliers over the real data files')
+    parser.add_argument('--repeat', type=int, default=1, help='timed runs per stage (the minimum is reported)')
+    parser.add_argument('--chunksize', type=int, default=100_000, help='rows per chunk for the streaming stage')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--workdir', help='keep generated inputs here instead of a temporary directory')
+    parser.add_argument('--output', default=os.path.join(ROOT, 'benchmarks', 'results.json'), help='JSON results file')
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+    workdir_root = args.workdir and os.path.abspath(args.workdir)
+
+    os.chdir(ROOT)  # survey_cache paths are relative to the repository root
+    results = {'meta': metadata(), 'runs': []}
+    for scale in args.scales:
+        workdir = os.path.join(workdir_root, f'{scale}x') if workdir_root else tempfile.mkdtemp(prefix=f'bench_{scale}x_')
+        os.makedirs(workdir, exist_ok=True)
+        try:
+            run = run_scale(scale, workdir, args.repeat, not args.no_memory, args.chunksize)
+        finally:
+            if not workdir_root:
+                shutil.rmtree(workdir, ignore_errors=True)
+        results['runs'].append(run)
+        print(f"{scale}x ({run['rows']['mental_health']} + {run['rows']['smmh']} rows)")
+        for stage, timing in run['stages'].items():
+            peak = timing['peak_alloc_bytes']
+            print(f"  {stage:<13} {timing['seconds']:8.3f}s" + (f"  peak {peak / 2**20:8.1f} MiB" if peak is not None else ''))
+
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
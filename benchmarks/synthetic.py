@@ -0,0 +1,42 @@
+# benchmarks/synthetic.py
+# Synthetic survey generators: larger CSVs with the exact schema of the files in data/
+
+import numpy as np
+import pandas as pd
+from survey_cache import MENTAL_HEALTH_PATH, SMMH_PATH
+
+BLOCK_ROWS = 100_000
+MENTAL_HEALTH_HEADER_ROWS = 2  # Qualtrics question text + ImportId rows under the export header
+
+
+def synthesize(source, path, rows, header_rows=0, seed=0, block_rows=BLOCK_ROWS):
+    """Write `rows` rows shaped like `source` to `path`.
+
+    Every column is resampled independently from its real values, so column names, header rows,
+    Likert vocabularies, platform combinations, state names and missing-value rates all match the
+    source. Rows are generated in blocks to keep memory flat at large scales.
+    """
+    raw = pd.read_csv(source, dtype=str, keep_default_na=False)
+    body = {col: raw[col].to_numpy()[header_rows:] for col in raw.columns}
+    rng = np.random.default_rng(seed)
+    with open(path, 'w', newline='') as f:
+        raw.iloc[:header_rows].to_csv(f, index=False)
+        written = 0
+        while written < rows:
+            n = min(block_rows, rows - written)
+            block = pd.DataFrame({col: values[rng.integers(0, len(values), n)] for col, values in body.items()})
+            block.to_csv(f, index=False, header=False)
+            written += n
+    return path
+
+
+def source_rows(source, header_rows=0):
+    return len(pd.read_csv(source, dtype=str)) - header_rows
+
+
+def synthesize_mental_health(path, rows, seed=0):
+    return synthesize(MENTAL_HEALTH_PATH, path, rows, MENTAL_HEALTH_HEADER_ROWS, seed)
+
+
+def synthesize_smmh(path, rows, seed=0):
+    return synthesize(SMMH_PATH, path, rows, 0, seed)
@@ -0,0 +1,170 @@
+# joins.py
+# Join layer for the IPEDS, Facebook intro-date and Traud et al. network files: the integer-key
+# lookups are built once per source change into one cached institution table, and the per-state
+# rollups are bincounts over its state codes
+
+import numpy as np
+import pandas as pd
+from survey_cache import CACHE_DIR, CENSUS_REGIONS_PATH, load_census_regions, load_derived
+
+IPEDS_PATH = 'data/IPEDS/hd2005.csv'
+ENROLLMENT_PATH = 'data/IPEDS/CSV_1182021-579.csv'
+INTRO_DATES_PATH = 'data/IntroDates/IntroDatesACHA.csv'
+NETWORK_PATH = 'data/TraudEtAl/NetworkDataTraudEtAl.csv'
+JOIN_SOURCES = [IPEDS_PATH, ENROLLMENT_PATH, INTRO_DATES_PATH, NETWORK_PATH, CENSUS_REGIONS_PATH]
+ROLLOUT_PATH = 'jLucaniaFacebookRollout.csv'  # per-state rollup written by every report build
+JOIN_VERSION = 1  # bump whenever build_institutions changes so the cached table is rebuilt
+
+ENROLLMENT_LEVELS = {'All students total': 'enrollment', 'All students, Undergraduate total': 'undergraduate'}
+NO_MATCH = -1
+
+
+def normalize_fbname(names):
+    """Case- and whitespace-insensitive Facebook network names ("Stanford " -> "stanford")."""
+    return names.str.strip().str.casefold().str.split().str.join(' ')
+
+
+def lookup(keys, values):
+    """Position of each of `values` in the sorted integer array `keys`, or NO_MATCH."""
+    pos = np.searchsorted(keys, values)
+    found = pos < len(keys)
+    found[found] = keys[pos[found]] == values[found]
+    return np.where(found, pos, NO_MATCH)
+
+
+def _take(column, positions, fill=np.nan):
+    # Gather `column` at `positions`, filling NO_MATCH rows
+    values = np.asarray(column)
+    out = np.full(len(positions), fill, dtype=np.result_type(values.dtype, np.asarray(fill).dtype))
+    hit = positions != NO_MATCH
+    out[hit] = values[positions[hit]]
+    return out
+
+
+def _read_institutions(path):
+    frame = pd.read_csv(path, usecols=['UNITID', 'INSTNM', 'STABBR'], encoding='latin-1')
+    return frame.sort_values('UNITID', kind='stable').reset_index(drop=True)
+
+
+def _read_enrollment(path):
+    # One row per institution and student level; keep the totals the rollups use, one column per level
+    raw = pd.read_csv(path, usecols=['unitid', 'EF2005.Level of student', 'EF2005_RV.Grand total'])
+    raw = raw[raw['EF2005.Level of student'].isin(ENROLLMENT_LEVELS.keys())]
+    wide = raw.pivot(index='unitid', columns='EF2005.Level of student', values='EF2005_RV.Grand total')
+    return wide.rename(columns=ENROLLMENT_LEVELS).reindex(columns=list(ENROLLMENT_LEVELS.values())).sort_index()
+
+
+def _read_intro_dates(path):
+    frame = pd.read_csv(path)
+    frame['joined'] = pd.to_datetime(frame['datejoinedfb'], format='%d%b%Y')
+    return frame
+
+
+def build_institutions(ipeds_path=IPEDS_PATH, enrollment_path=ENROLLMENT_PATH, intro_dates_path=INTRO_DATES_PATH,
+                       network_path=NETWORK_PATH, census_regions=None):
+    """One row per IPEDS institution (indexed by UNITID) with its state, enrollment and Facebook rollout.
+
+    Every join is an integer lookup: UNITID into the enrollment and intro-date files, STABBR into the
+    census state codes, and the intro-date network id into the Traud et al. network sizes. Traud
+    network names are truncated ("UC" is Davis, Irvine and Riverside), so they key on the network's
+    intro order and the normalized fbname only has to agree on the first word. Intro-date rows whose
+    unitid is not in IPEDS 2005 are dropped.
+    """
+    if census_regions is None:
+        census_regions = load_census_regions()
+    institutions = _read_institutions(ipeds_path)
+    enrollment = _read_enrollment(enrollment_path)
+    intro = _read_intro_dates(intro_dates_path)
+    network = pd.read_csv(network_path).sort_values('intro_num', kind='stable').reset_index(drop=True)
+    unitids = institutions['UNITID'].to_numpy()
+
+    table = pd.DataFrame({'instnm': institutions['INSTNM'].to_numpy(), 'stabbr': institutions['STABBR'].to_numpy()},
+                         index=pd.Index(unitids, name='unitid'))
+    states = pd.Index(census_regions['State Code'])
+    table['state_code'] = states.get_indexer(table['stabbr']).astype(np.int8)  # territories get NO_MATCH
+    enrollment_pos = lookup(enrollment.index.to_numpy(), unitids)
+    for col in enrollment.columns:
+        table[col] = _take(enrollment[col], enrollment_pos)
+
+    # Facebook rollout: intro-date rows scattered onto their institution
+    intro_pos = lookup(unitids, intro['unitid'].to_numpy())
+    matched = intro_pos != NO_MATCH
+    intro, intro_pos = intro[matched], intro_pos[matched]
+    facebook_id = np.full(len(table), NO_MATCH, dtype=np.int64)
+    facebook_id[intro_pos] = intro['id'].to_numpy()
+    table['facebook_id'] = facebook_id
+    fbname = np.full(len(table), None, dtype=object)
+    fbname[intro_pos] = intro['fbname'].str.strip().to_numpy()
+    table['fbname'] = fbname
+    batch = np.zeros(len(table), dtype=np.int8)
+    batch[intro_pos] = intro['expansion_batch'].to_numpy()
+    table['expansion_batch'] = batch
+    joined = np.full(len(table), np.datetime64('NaT'), dtype=intro['joined'].dtype)
+    joined[intro_pos] = intro['joined'].to_numpy()
+    table['joined'] = joined
+
+    # Network sizes for the first Facebook schools
+    network_pos = lookup(network['intro_num'].to_numpy(), facebook_id)
+    hit = network_pos != NO_MATCH
+    first_word = normalize_fbname(pd.Series(fbname[hit], dtype=object)).str.split().str[0]
+    agrees = first_word.to_numpy() == normalize_fbname(network['fbname']).to_numpy()[network_pos[hit]]
+    network_pos[np.flatnonzero(hit)[~agrees]] = NO_MATCH
+    table['network_users'] = _take(network['full'], network_pos)
+    table['network_students'] = _take(network['student'], network_pos)
+    return table
+
+
+def load_institutions(cache_dir=CACHE_DIR):
+    """The `build_institutions` table, served from cache/ until one of the join sources changes."""
+    return load_derived('institutions', JOIN_SOURCES,
+                        lambda: build_institutions(census_regions=load_census_regions(cache_dir=cache_dir)),
+                        JOIN_VERSION, cache_dir)
+
+
+def facebook_institutions(institutions):
+    """Per-institution view: the institutions on Facebook, in rollout order, with network reach."""
+    view = institutions[institutions['facebook_id'] != NO_MATCH].sort_values(['joined', 'facebook_id'], kind='stable')
+    view = view.drop(columns='state_code')
+    view['network_share'] = (view['network_students'] / view['enrollment']) * 100
+    return view
+
+
+def _sum_by_state(state_codes, weights, rows, n_states):
+    valid = rows & (state_codes >= 0)
+    return np.bincount(state_codes[valid], weights=weights[valid], minlength=n_states)
+
+
+def state_rollup(institutions, census_regions):
+    """Per-state Facebook rollout versus enrollment, one row per state in `census_regions`.
+
+    `share_batch_<n>` is the percentage of the state's enrollment on Facebook after expansion batch n.
+    Network sizes are counted once per network even when it spans several institutions.
+    """
+    n_states = len(census_regions)
+    codes = institutions['state_code'].to_numpy().astype(np.intp)
+    enrollment = np.nan_to_num(institutions['enrollment'].to_numpy(dtype=float))
+    batch = institutions['expansion_batch'].to_numpy()
+    facebook_id = institutions['facebook_id'].to_numpy()
+    on_facebook = facebook_id != NO_MATCH
+    everyone = np.ones(len(institutions), dtype=bool)
+    ones = np.ones(len(institutions))
+
+    rollup = census_regions[['State', 'State Code', 'Region', 'Division']].reset_index(drop=True)
+    rollup['institutions'] = _sum_by_state(codes, ones, everyone, n_states).astype(np.int64)
+    rollup['enrollment'] = _sum_by_state(codes, enrollment, everyone, n_states).astype(np.int64)
+    rollup['facebook_institutions'] = _sum_by_state(codes, ones, on_facebook, n_states).astype(np.int64)
+    rollup['facebook_enrollment'] = _sum_by_state(codes, enrollment, on_facebook, n_states).astype(np.int64)
+    rollup['facebook_share'] = (rollup['facebook_enrollment'] / rollup['enrollment']) * 100
+    for n in range(1, batch.max() + 1):
+        reached = _sum_by_state(codes, enrollment, on_facebook & (batch <= n), n_states)
+        rollup[f'share_batch_{n}'] = (reached / rollup['enrollment']) * 100
+
+    joined = institutions['joined']
+    first = joined.groupby(codes).min()
+    rollup['first_joined'] = first.reindex(range(n_states)).to_numpy()
+    first_network = on_facebook & ~pd.Series(facebook_id).duplicated().to_numpy()
+    for col in ('network_users', 'network_students'):
+        users = institutions[col].to_numpy(dtype=float)
+        rows = first_network & ~np.isnan(users)
+        rollup[col] = _sum_by_state(codes, np.nan_to_num(users), rows, n_states).astype(np.int64)
+    return rollup
@@ -0,0 +1,66 @@
+# platforms.py
+# Sparse respondent x platform indicator matrix for the multi-select "platforms" answer.
+# Each distinct answer string is split once; rows are then indexed in CSR form so platform
+# breakdowns cost O(nonzeros) instead of exploding a copy of every row per platform.
+
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+PLATFORM_SEP = ', '
+
+# CSR layout: the platforms of row i are platforms[indices[indptr[i]:indptr[i + 1]]]
+PlatformMatrix = namedtuple('PlatformMatrix', ['indptr', 'indices', 'platforms'])
+
+
+def build_platform_matrix(answers, sep=PLATFORM_SEP):
+    """Index a Series of comma-separated platform answers; missing answers become empty rows.
+
+    Platforms are numbered in sorted order and repeated names within one answer are kept, so
+    counts match `str.split(sep)` + `explode`.
+    """
+    if isinstance(answers.dtype, pd.CategoricalDtype):
+        row_answer, distinct = answers.cat.codes.to_numpy(), answers.cat.categories
+    else:
+        row_answer, distinct = pd.factorize(answers)
+    split = [str(answer).split(sep) for answer in distinct]
+    platforms = np.array(sorted({name for names in split for name in names}), dtype=object)
+    lookup = {name: code for code, name in enumerate(platforms)}
+
+    # Per distinct answer CSR, then gathered to rows
+    answer_nnz = np.array([len(names) for names in split] + [0], dtype=np.int64)
+    answer_indices = np.array([lookup[name] for names in split for name in names], dtype=np.int32)
+    answer_indptr = np.concatenate(([0], np.cumsum(answer_nnz[:-1])))
+    row_nnz = answer_nnz[row_answer]  # code -1 (missing) picks the trailing 0
+    indptr = np.concatenate(([0], np.cumsum(row_nnz)))
+    offsets = np.arange(indptr[-1]) - np.repeat(indptr[:-1], row_nnz)
+    indices = answer_indices[np.repeat(answer_indptr[np.maximum(row_answer, 0)], row_nnz) + offsets]
+    return PlatformMatrix(indptr, indices, platforms)
+
+
+def row_counts(matrix):
+    """Number of platforms named in each row."""
+    return np.diff(matrix.indptr)
+
+
+def platform_breakdown(matrix, group_codes, n_groups, rows=None):
+    """Return the (n_groups, n_platforms) count matrix G^T X over the selected rows.
+
+    `group_codes` holds one integer group per row (-1 to skip the row) and `rows` is an optional
+    boolean row mask.
+    """
+    n_platforms = len(matrix.platforms)
+    keep_rows = group_codes >= 0
+    if rows is not None:
+        keep_rows &= rows
+    row_of_nz = np.repeat(np.arange(len(group_codes)), row_counts(matrix))
+    keep = keep_rows[row_of_nz]
+    flat = group_codes[row_of_nz[keep]].astype(np.int64) * n_platforms + matrix.indices[keep]
+    return np.bincount(flat, minlength=n_groups * n_platforms).reshape(n_groups, n_platforms)
+
+
+def breakdown_series(counts, group_labels, platforms, names):
+    """Long-form (group, platform) -> count Series of the nonzero cells, like `groupby(...).size()`."""
+    group_idx, platform_idx = np.nonzero(counts)
+    index = pd.MultiIndex.from_arrays([np.asarray(group_labels)[group_idx], platforms[platform_idx]], names=names)
+    return pd.Series(counts[group_idx, platform_idx].astype(np.int64), index=index)
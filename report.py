@@ -0,0 +1,495 @@
+# report.py
+# Report pipeline: every section is an independent task (build its figure, serialize it to HTML)
+# run on a process pool; the fragments are assembled into the page in section order
+
+import base64
+import json
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.express as px
+from plotly.offline import get_plotlyjs_version
+from plotly.utils import PlotlyJSONEncoder
+from aggregates import ANXIETY_THRESHOLD, DEPRESSION_THRESHOLD
+from stages import max_rss_bytes, profiled
+from survey_cache import (ANXIETY_COL, CENSUS_REGIONS_PATH, DEPRESSION_COL, MENTAL_HEALTH_PATH, SMMH_PATH, STATE_COL,
+                          TIME_COL, TIME_ORDER)
+
+REPORT_PATH = 'jLucaniaMentalHealth.html'
+MANIFEST_PATH = os.path.splitext(REPORT_PATH)[0] + '.manifest.json'
+STAGES = ['build', 'serialize']
+OUTPUT_MODES = ['inline', 'compact']
+
+
+# --- Report tables ---
+
+def make_pivot(counts, score_col):
+    pivot_count = counts.pivot(index=score_col, columns='platform', values='count').fillna(0)
+    pivot_percent = pivot_count.div(pivot_count.sum(axis=1), axis=0) * 100
+    return pivot_count, pivot_percent
+
+
+def prepare_tables(state_summary, census_regions, smmh_tables):
+    """Final tables for the sections: the choropleth join, the heatmap pivots and ordered conclusion rows.
+
+    Either input may be None when no section that reads it needs rebuilding.
+    """
+    tables = {}
+    if state_summary is not None:
+        tables['choropleth_data'] = pd.merge(state_summary, census_regions, left_on=STATE_COL, right_on='State', how='left')
+    if smmh_tables is not None:
+        tables['total_counts'] = smmh_tables['total_counts']
+        tables['platform_counts'] = smmh_tables['platform_counts']
+        tables['depr_counts'], tables['depr_percent'] = make_pivot(smmh_tables['depression_counts'], DEPRESSION_COL)
+        tables['anx_counts'], tables['anx_percent'] = make_pivot(smmh_tables['anxiety_counts'], ANXIETY_COL)
+        # Order time bins consistently
+        conclusion_summary = smmh_tables['conclusion_summary'].copy()
+        conclusion_summary[TIME_COL] = pd.Categorical(conclusion_summary[TIME_COL], categories=TIME_ORDER, ordered=True)
+        tables['conclusion_summary'] = conclusion_summary.sort_values(TIME_COL)
+    return tables
+
+
+# --- Figures ---
+
+def build_map_figure(tables):
+    # Mental Health Choropleth Map
+    choropleth_data = tables['choropleth_data']
+    fig_map = go.Figure()
+    fig_map.add_trace(go.Choropleth(
+        locations=choropleth_data['State Code'], 
+        z=choropleth_data['GAD7_Negative_Percent'],
+        locationmode='USA-states', 
+        colorscale='Reds', 
+        colorbar_title="Anxiety (%)", 
+        visible=False,  # Changed from True to False
+        text=choropleth_data['State'],
+        hovertemplate='%{text}<br>Anxiety: %{z:.2f}%<extra></extra>'
+    ))
+    fig_map.add_trace(go.Choropleth(
+        locations=choropleth_data['State Code'], 
+        z=choropleth_data['PHQ9_Negative_Percent'],
+        locationmode='USA-states', 
+        colorscale='Blues', 
+        colorbar_title="Depression (%)", 
+        visible=True,  # Changed from False to True
+        text=choropleth_data['State'],
+        hovertemplate='%{text}<br>Depression: %{z:.2f}%<extra></extra>'
+    ))
+
+    fig_map.update_layout(title_text='Mental Health Negative Responses by State', geo=dict(scope='usa', projection=dict(type='albers usa'), showcountries=False, showlakes=True, lakecolor='white'), dragmode=False)
+    return fig_map
+
+
+def build_social_figure(tables):
+    # Social Media Bar Chart
+    total_counts = tables['total_counts']
+    platform_counts = tables['platform_counts']
+    platforms = platform_counts['platform'].unique()
+    platform_colors = px.colors.qualitative.Dark24
+    fig_social = go.Figure()
+    fig_social.add_trace(go.Bar(x=total_counts[TIME_COL], y=total_counts['total'], marker_color='lightgray', name='Total Responses', hoverinfo='skip'))
+    for idx, platform in enumerate(platforms):
+        data = platform_counts[platform_counts['platform'] == platform]
+        fig_social.add_trace(go.Bar(
+            x=data[TIME_COL],
+            y=data['scaled'],
+            name=platform,
+            marker_color=platform_colors[idx % len(platform_colors)],
+            visible='legendonly',
+            hovertemplate='%{x}<br>' + platform + ': %{y:.2f}%<extra></extra>',
+        ))
+    fig_social.update_layout(barmode='overlay', bargap=0, title='Social Media Platform Breakdown by Daily Usage Time (Raw Counts)', xaxis_title='Daily Social Media Usage Time', yaxis_title='Number of Responses', showlegend=False, xaxis=dict(categoryorder='array', categoryarray=['Less than an Hour', 'Between 1 and 2 hours', 'Between 2 and 3 hours', 'Between 3 and 4 hours', 'Between 4 and 5 hours', 'More than 5 hours']))
+    return fig_social
+
+
+def build_heatmap_figure(tables):
+    # Mental Health vs. Platform Heatmap
+    depr_counts, depr_percent = tables['depr_counts'], tables['depr_percent']
+    anx_counts, anx_percent = tables['anx_counts'], tables['anx_percent']
+    fig_heatmap = go.Figure()
+    fig_heatmap.add_trace(go.Heatmap(z=depr_counts.values, x=depr_counts.columns, y=depr_counts.index, colorscale='Blues', colorbar_title='Count', visible=True, hovertemplate='Platform: %{x}<br>Severity: %{y}<br>Count: %{z}<extra></extra>'))
+    fig_heatmap.add_trace(go.Heatmap(z=anx_counts.values, x=anx_counts.columns, y=anx_counts.index, colorscale='Reds', colorbar_title='Count', visible=False, hovertemplate='Platform: %{x}<br>Severity: %{y}<br>Count: %{z}<extra></extra>'))
+    fig_heatmap.add_trace(go.Heatmap(z=depr_percent.values, x=depr_percent.columns, y=depr_percent.index, colorscale='Blues', colorbar_title='Percent', visible=False, hovertemplate='Platform: %{x}<br>Severity: %{y}<br>Percent: %{z:.2f}%<extra></extra>'))
+    fig_heatmap.add_trace(go.Heatmap(z=anx_percent.values, x=anx_percent.columns, y=anx_percent.index, colorscale='Reds', colorbar_title='Percent', visible=False, hovertemplate='Platform: %{x}<br>Severity: %{y}<br>Percent: %{z:.2f}%<extra></extra>'))
+    fig_heatmap.update_layout(title='Mental Health Severity vs Social Media Platform', xaxis_title='Platform', yaxis_title='Severity (1 = Low, 5 = High)', margin=dict(l=40, r=40, t=80, b=40), plot_bgcolor='white')
+    return fig_heatmap
+
+
+def build_conclusion_figure(tables):
+    # Scatter plot instead of bar
+    conclusion_summary = tables['conclusion_summary']
+    # Legend cutoffs follow the thresholds the rates were computed at
+    anxiety_threshold = conclusion_summary.attrs.get('anxiety_threshold', ANXIETY_THRESHOLD)
+    depression_threshold = conclusion_summary.attrs.get('depression_threshold', DEPRESSION_THRESHOLD)
+    fig_conclusion = go.Figure()
+    fig_conclusion.add_trace(go.Scatter(
+        x=conclusion_summary[TIME_COL], y=conclusion_summary['Anxiety_Rate'],
+        mode='markers+lines', name=f'Anxiety (GAD-7 ≥ {anxiety_threshold})', marker=dict(color='crimson', size=10),
+        line=dict(color='crimson'), hovertemplate='%{x}<br>Anxiety: %{y:.2f}%<extra></extra>'
+    ))
+    fig_conclusion.add_trace(go.Scatter(
+        x=conclusion_summary[TIME_COL], y=conclusion_summary['Depression_Rate'],
+        mode='markers+lines', name=f'Depression (PHQ-9 ≥ {depression_threshold})', marker=dict(color='steelblue', size=10),
+        line=dict(color='steelblue'), hovertemplate='%{x}<br>Depression: %{y:.2f}%<extra></extra>'
+    ))
+    fig_conclusion.update_layout(title='Rates of Anxiety and Depression by Social Media Usage Time',
+        xaxis_title='Daily Social Media Usage Time', yaxis_title='Percentage of Respondents (%)',
+        margin=dict(l=40, r=40, t=80, b=40), plot_bgcolor='white')
+    return fig_conclusion
+
+
+# --- Page and section fragments ---
+
+PAGE_HEAD = """<html><head><title>Mental Health and Social Media</title>
+    <link rel="stylesheet" href="styles.css">
+    <link href="https://fonts.googleapis.com/css2?family=Lato:wght@300;400;700&display=swap" rel="stylesheet">
+    </head><body><div class="progress-container"><div class="progress-bar"></div></div><div class="header">
+  <a href="#introduction">Introduction</a>
+  <a href="#mental-health">Mental Health</a>
+  <a href="#social-media">Social Media Usage</a>
+  <a href="#heatmap">Comparison & Correlation</a>
+  <a href="#conclusion">Conclusion</a>
+</div>
+"""
+
+
+def introduction_html(tables, fig_html):
+    return """<div class="section" id="introduction"><h1>Introduction</h1><p>This report investigates the intersection between mental health indicators and social media usage patterns among U.S. adults. Leveraging survey data on anxiety (GAD-7), depression (PHQ-9), and daily social media engagement across multiple platforms, the analysis aims to reveal underlying trends and correlations. Specifically, the report visualizes mental health prevalence geographically, tracks platform-specific social media usage over time, and explores the correlation between usage intensity and mental health outcomes.
+</p></div>"""
+
+
+def mental_health_html(tables, fig_html):
+    return ("""<div class="section" id="mental-health"><h2>Mental Health (Anxiety, Depression)</h2><p>Toggle map view: <span class="platform-toggle" data-map-trace="0">Anxiety (GAD-7)</span>, <span class="platform-toggle" data-map-trace="1">Depression (PHQ-9)</span></p><div class="plot-container">"""
+            + fig_html
+            + """</div><p>Both the anxiety (GAD-7) and depression (PHQ-9) maps reveal overlapping patterns, but with key differences in distribution. Anxiety rates tend to be more concentrated, with states like Idaho, North Dakota, Mississippi, and West Virginia standing out as higher prevalence areas. These clusters may reflect factors such as rural isolation, economic strain, or limited access to mental health services. Depression, on the other hand, appears more broadly distributed across regions, with elevated levels not only in the same high-anxiety states but also extending further into the Midwest and East Coast. This suggests that while both conditions share common underlying drivers, depression may be more consistently influenced by broader socioeconomic disparities. Together, these maps highlight both targeted areas for anxiety-specific interventions and the need for expanded mental health resources addressing depression on a wider scale.
+</p></div>""")
+
+
+def social_media_html(tables, fig_html):
+    platforms = tables['platform_counts']['platform'].unique()
+    clickable_platforms = ', '.join([f'<span class="platform-toggle" data-platform="{platform}">{platform}</span>' for platform in platforms])
+    return ("""<div class="section" id="social-media"><h2>Social Media Usage Over Time</h2><p>Toggle platforms (By percent of total):"""
+            + clickable_platforms
+            + """</p><div class="plot-container">"""
+            + fig_html
+            + """</div><p>The social media usage breakdown highlights clear differences in platform engagement across daily time ranges. <span class=\"platform-toggle\" data-platform=\"YouTube\">YouTube</span>, <span class=\"platform-toggle\" data-platform=\"Instagram\">Instagram</span>, <span class=\"platform-toggle\" data-platform=\"Facebook\">Facebook</span>, and <span class=\"platform-toggle\" data-platform=\"Discord\">Discord</span> show consistent usage across all time bins, with <strong>YouTube</strong> slightly stronger among heavy users, reflecting its flexible content length and broad appeal. In contrast, <span class=\"platform-toggle\" data-platform=\"TikTok\">TikTok</span> and <span class=\"platform-toggle\" data-platform=\"Reddit\">Reddit</span> skew heavily toward higher usage brackets, particularly among those spending more than five hours per day on social media. These platforms are designed for immersive, extended engagement, which aligns with their dominance among heavy users. <span class=\"platform-toggle\" data-platform=\"Snapchat\">Snapchat</span> and <span class=\"platform-toggle\" data-platform=\"Discord\">Discord</span> maintain steady engagement across moderate to high usage ranges, serving as routine communication tools. Meanwhile, <span class=\"platform-toggle\" data-platform=\"Pinterest\">Pinterest</span> and <span class=\"platform-toggle\" data-platform=\"Twitter\">Twitter</span> show lower overall engagement, concentrated mainly in lighter usage groups.
+</p></div>""")
+
+
+def heatmap_html(tables, fig_html):
+    return ("""<div class="section" id="heatmap"><h2>Mental Health Severity by Platform</h2>
+    <p><strong>Select Mental Health Measure:</strong> <span class="platform-toggle" data-heatmap-type="depression">Depression</span>, <span class="platform-toggle" data-heatmap-type="anxiety">Anxiety</span></p>
+    <p><strong>Select Data View:</strong> <span class="platform-toggle" data-heatmap-mode="counts">Counts</span>, <span class="platform-toggle" data-heatmap-mode="percent">Percentages</span></p>
+    <p><em>The counts view displays the raw number of respondents at each severity level for each platform, highlighting where responses are most concentrated. The percentages view normalizes these counts, showing the proportion of respondents at each severity level relative to the platform total, allowing for direct comparison across platforms.</em></p>
+    <div class="plot-container">"""
+            + fig_html
+            + """</div><p>This heatmap illustrates the relationship between mental health severity (Depression, Anxiety) and social media platform usage. Severity levels range from 1 (low) to 5 (high), offering a clear visual representation of mental health distributions across different platforms. The counts view highlights raw engagement numbers, while the percentages view reveals relative proportions within each severity level.
+
+The heatmaps reveal that Facebook, YouTube, and Instagram consistently exhibit higher mental health severity rates for both depression and anxiety, particularly at mid-to-high severity levels. These findings suggest that more frequent engagement on these platforms may be associated with elevated mental health risks. In contrast, TikTok, Reddit, and Pinterest show lower associations, indicating less overlap with severe mental health symptoms in this dataset.
+</p></div>""")
+
+
+def conclusion_html(tables, fig_html):
+    return ("""<div class="section" id="conclusion"><h2>Conclusion: Mental Health Trends by Social Media Usage</h2>
+    <p>As a final analysis, this scatter plot summarizes the relationship between daily social media usage and rates of negative mental health outcomes (anxiety and depression). The data shows a clear upward trend for both conditions:
+</p>
+    <ul>
+        <li><strong>Depression rates</strong> (blue) start at around 25% for those spending less than an hour per day but climb to nearly 90% among users who spend more than five hours online.
+</li>
+        <li><strong>Anxiety rates</strong> (red) follows a similar pattern, rising from around 26% to over 70% as time spent increases.
+</li>
+            </ul>
+    <div class="plot-container">"""
+            + fig_html
+            + """</div><p>Both trends suggest that increased social media use is associated with heightened mental health risks. Depression consistently remains higher across all time groups but shows a sharper increase after 2-3 hours of daily use. Anxiety rises more gradually but still peaks alongside heavy usage.</p>"""
+            + """<p>The scatter plot demonstrates a strong correlation between daily social media usage time and the prevalence of anxiety and depression symptoms. Both conditions intensify as usage time increases, with depression rates consistently higher across all groups. This trend suggests that longer periods of social media engagement may be a contributing factor to worsening mental health, particularly for depression.</p></div>"""
+            + """</div></div>""")
+
+
+# JavaScript
+PAGE_SCRIPT = """<script>window.addEventListener('load', () => {
+        // Scroll progress bar
+        window.addEventListener('scroll', () => {
+            const scrollTop = window.scrollY;
+            const scrollHeight = document.documentElement.scrollHeight - window.innerHeight;
+            const scrolled = (scrollTop / scrollHeight) * 100;
+            document.querySelector('.progress-bar').style.width = scrolled + '%';
+        });
+
+        const mapPlot = document.querySelectorAll('.plotly-graph-div')[0];
+        const socialPlot = document.querySelectorAll('.plotly-graph-div')[1];
+        const heatmapPlot = document.querySelectorAll('.plotly-graph-div')[2];
+
+        // Compact output: a figure is created from its JSON spec the first time it nears the viewport
+        function plotted(plot) {
+            const spec = document.getElementById(plot.id + '-spec');
+            if (plot.data || !spec) return Promise.resolve(plot);
+            if (!plot.pending) {
+                const figure = JSON.parse(spec.textContent);
+                plot.pending = Plotly.newPlot(plot, figure.data, figure.layout, figure.config);
+            }
+            return plot.pending;
+        }
+        const lazyPlots = document.querySelectorAll('.lazy-figure');
+        if (lazyPlots.length) {
+            const observer = new IntersectionObserver(entries => {
+                entries.forEach(entry => {
+                    if (entry.isIntersecting) {
+                        observer.unobserve(entry.target);
+                        plotted(entry.target);
+                    }
+                });
+            }, {rootMargin: '200px'});
+            lazyPlots.forEach(plot => observer.observe(plot));
+        }
+
+        // Map toggle
+        document.querySelectorAll('[data-map-trace]').forEach(el => {
+            el.addEventListener('click', () => {
+                const traceIndex = parseInt(el.getAttribute('data-map-trace'));
+                plotted(mapPlot).then(plot => {
+                    Plotly.restyle(plot, {'visible': plot.data.map((trace, i) => i === traceIndex)});
+                });
+            });
+        });
+
+        // Social media toggle
+        document.querySelectorAll('[data-platform]').forEach(el => {
+            el.addEventListener('click', () => {
+                const platformName = el.getAttribute('data-platform');
+                plotted(socialPlot).then(plot => {
+                    // One restyle for every platform trace; the total bar is left alone
+                    const indices = [];
+                    const visible = [];
+                    plot.data.forEach((trace, i) => {
+                        if(trace.name !== 'Total Responses') {
+                            indices.push(i);
+                            visible.push(trace.name === platformName ? true : 'legendonly');
+                        }
+                    });
+                    Plotly.restyle(plot, {'visible': visible}, indices);
+                });
+            });
+        });
+
+        // Heatmap toggle (separated logic)
+        let heatmapType = 'depression'; // depression or anxiety
+        let heatmapMode = 'counts'; // counts or percent
+
+        function updateHeatmap() {
+            const traceMap = {
+                'depression_counts': 0,
+                'anxiety_counts': 1,
+                'depression_percent': 2,
+                'anxiety_percent': 3
+            };
+            const traceIndex = traceMap[heatmapType + '_' + heatmapMode];
+            plotted(heatmapPlot).then(plot => {
+                Plotly.restyle(plot, {'visible': plot.data.map((trace, i) => i === traceIndex)});
+            });
+        }
+
+        document.querySelectorAll('[data-heatmap-type]').forEach(el => {
+            el.addEventListener('click', () => {
+                heatmapType = el.getAttribute('data-heatmap-type');
+                updateHeatmap();
+            });
+        });
+        document.querySelectorAll('[data-heatmap-mode]').forEach(el => {
+            el.addEventListener('click', () => {
+                heatmapMode = el.getAttribute('data-heatmap-mode');
+                updateHeatmap();
+            });
+        });
+
+        if (heatmapPlot.data) updateHeatmap(); // Initialize (lazy figures are created in this state)
+    });</script></body></html>"""
+
+
+# --- Compact output ---
+
+# plotly.js typed-array specs; int64 has no typed-array counterpart
+TYPED_ARRAY_DTYPES = {np.dtype(code): code for code in ['i1', 'u1', 'i2', 'u2', 'i4', 'u4', 'f4', 'f8']}
+
+
+def _plotlyjs_supports_typed_arrays():
+    major, minor = (int(part) for part in get_plotlyjs_version().split('.')[:2])
+    return (major, minor) >= (2, 28)
+
+
+def typed_arrays(value):
+    """Replace numeric arrays in a figure dict with base64 {dtype, bdata, shape} payloads."""
+    if isinstance(value, dict):
+        return {key: typed_arrays(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [typed_arrays(item) for item in value]
+    if isinstance(value, np.ndarray) and value.dtype.kind in 'iuf':
+        if value.dtype not in TYPED_ARRAY_DTYPES:
+            fits_i4 = value.dtype.kind != 'f' and (value.size == 0 or (value.min() >= -2**31 and value.max() < 2**31))
+            value = value.astype('i4' if fits_i4 else 'f8')
+        payload = np.ascontiguousarray(value, dtype=value.dtype.newbyteorder('<'))
+        return {'dtype': TYPED_ARRAY_DTYPES[value.dtype], 'bdata': base64.b64encode(payload.tobytes()).decode('ascii'),
+                'shape': ','.join(str(dim) for dim in value.shape)}
+    return value
+
+
+def lazy_figure_html(name, fig):
+    """Placeholder div plus the figure's JSON spec; the page script plots it when it scrolls into view."""
+    figure = fig.to_plotly_json()
+    if _plotlyjs_supports_typed_arrays():
+        figure['data'] = typed_arrays(figure['data'])
+    figure['config'] = {'responsive': True}
+    spec = json.dumps(figure, cls=PlotlyJSONEncoder, separators=(',', ':')).replace('</', '<\\/')
+    return (f'<div id="fig-{name}" class="plotly-graph-div lazy-figure" style="height:100%; width:100%;"></div>'
+            f'<script type="application/json" id="fig-{name}-spec">{spec}</script>')
+
+
+def plotlyjs_tag():
+    return f'<script src="https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js" charset="utf-8"></script>'
+
+
+# --- Pipeline ---
+
+# Dependency graph: `inputs` names the prepare_tables() entries a section reads (only those are
+# shipped to its worker), `sources` the data files they come from and `params` the run parameters
+# that change its output. section_cache.py keys the cached fragments on all three.
+Section = namedtuple('Section', ['name', 'inputs', 'build', 'render', 'plotlyjs', 'sources', 'params'])
+
+SECTIONS = [
+    Section('introduction', [], None, introduction_html, False, [], []),
+    Section('mental-health', ['choropleth_data'], build_map_figure, mental_health_html, 'cdn',
+            [MENTAL_HEALTH_PATH, CENSUS_REGIONS_PATH], ['output', 'phq9_threshold', 'gad7_threshold']),
+    Section('social-media', ['total_counts', 'platform_counts'], build_social_figure, social_media_html, False,
+            [SMMH_PATH], ['output']),
+    Section('heatmap', ['depr_counts', 'depr_percent', 'anx_counts', 'anx_percent'], build_heatmap_figure, heatmap_html, False,
+            [SMMH_PATH], ['output']),
+    Section('conclusion', ['conclusion_summary'], build_conclusion_figure, conclusion_html, False,
+            [SMMH_PATH], ['output', 'anxiety_threshold', 'depression_threshold']),
+]
+
+
+def render_section(index, tables, output='inline', profile=None):
+    """Worker task: build and serialize one section.
+
+    Returns (fragment, stats): stats holds the build/serialize (start, end) timestamps and the
+    worker's peak RSS. `profile` is an optional stages.ProfileOptions.
+    """
+    section = SECTIONS[index]
+    start = time.perf_counter()
+    with profiled('build-' + section.name, profile):
+        fig = section.build(tables) if section.build else None
+    built = time.perf_counter()
+    with profiled('serialize-' + section.name, profile):
+        if fig is None:
+            fig_html = ''
+        elif output == 'compact':
+            fig_html = lazy_figure_html(section.name, fig)
+        else:
+            fig_html = fig.to_html(full_html=False, include_plotlyjs=section.plotlyjs)
+        fragment = section.render(tables, fig_html)
+    done = time.perf_counter()
+    return fragment, {'build': (start, built), 'serialize': (built, done), 'max_rss_bytes': max_rss_bytes()}
+
+
+def render_sections(tables, jobs=None, names=None, output='inline', profile=None):
+    """Render the sections in `names` (default: all), on a process pool when `jobs` > 1.
+
+    Returns {name: (fragment, stats)} in section order.
+    """
+    tasks = [(index, {key: tables[key] for key in section.inputs}) for index, section in enumerate(SECTIONS)
+             if names is None or section.name in names]
+    jobs = min(jobs or os.cpu_count() or 1, len(tasks))
+    if jobs <= 1:
+        results = [render_section(index, section_tables, output, profile) for index, section_tables in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(render_section, *zip(*tasks), [output] * len(tasks), [profile] * len(tasks)))
+    return {SECTIONS[index].name: result for (index, _), result in zip(tasks, results)}
+
+
+def _covered(spans):
+    """Length of the union of (start, end) intervals: the wall time during which any task was in a stage."""
+    covered, reach = 0.0, None
+    for start, end in sorted(spans):
+        if reach is None or start > reach:
+            covered += end - start
+            reach = end
+        elif end > reach:
+            covered += end - reach
+            reach = end
+    return covered
+
+
+def stage_timings(results, wall=None):
+    """Per stage: summed task time (the serial cost), wall time covered across workers and the speedup.
+
+    perf_counter is a system-wide monotonic clock, so worker timestamps are comparable. When the
+    `wall` time of the whole render step is given, a `sections` total (pool start-up and result
+    transfer included) is added.
+    """
+    timings = {}
+    for stage in STAGES:
+        task_spans = [stats[stage] for _, stats in results.values()]
+        serial = sum(end - start for start, end in task_spans)
+        covered = _covered(task_spans)
+        timings[stage] = {'serial': serial, 'wall': covered, 'speedup': serial / covered if covered else 1.0}
+    if wall is not None:
+        serial = sum(timing['serial'] for timing in timings.values())
+        timings['sections'] = {'serial': serial, 'wall': wall, 'speedup': serial / wall if wall else 1.0}
+    return timings
+
+
+def section_stage_records(results, tables):
+    """Run-manifest records for the build and serialize stages, with a per-section breakdown."""
+    timings = stage_timings(results)
+    records = []
+    for stage in STAGES:
+        sections = {}
+        for section in SECTIONS:
+            if section.name not in results:
+                continue
+            fragment, stats = results[section.name]
+            start, end = stats[stage]
+            # build turns tables into a figure, serialize turns the figure into an HTML fragment
+            rows_out = int(section.build is not None) if stage == 'build' else 1
+            detail = {'seconds': end - start, 'rows_in': sum(len(tables[key]) for key in section.inputs),
+                      'rows_out': rows_out}
+            if stage == 'serialize':
+                detail['output_bytes'] = len(fragment.encode('utf-8'))
+            sections[section.name] = detail
+        rss = [stats['max_rss_bytes'] for _, stats in results.values() if stats['max_rss_bytes'] is not None]
+        record = {'name': stage, 'seconds': timings[stage]['wall'], 'serial_seconds': timings[stage]['serial'],
+                  'rows_in': sum(detail['rows_in'] for detail in sections.values()),
+                  'rows_out': sum(detail['rows_out'] for detail in sections.values())}
+        if stage == 'serialize':
+            record['output_bytes'] = sum(detail['output_bytes'] for detail in sections.values())
+        record['max_rss_bytes'] = max(rss) if rss else None
+        record['sections'] = sections
+        records.append(record)
+    return records
+
+
+def page_html(fragments, output='inline'):
+    """Assemble the page from every section's fragment."""
+    parts = [PAGE_HEAD]
+    if output == 'compact':
+        parts.append(plotlyjs_tag())
+    parts += [fragments[section.name] for section in SECTIONS]
+    parts.append(PAGE_SCRIPT)
+    return ''.join(parts)
+
+
+def write_page(path, fragments, output='inline'):
+    """Write the assembled page to `path`; returns the bytes written."""
+    with open(path, "w") as f:
+        f.write(page_html(fragments, output))
+    return os.path.getsize(path)
+
+
+def print_timings(timings):
+    for stage, timing in timings.items():
+        print(f"  {stage:<10} serial {timing['serial']:.3f}s  wall {timing['wall']:.3f}s  speedup {timing['speedup']:.2f}x")
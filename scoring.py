@@ -0,0 +1,97 @@
+# scoring.py
+# Vectorized PHQ-9 / GAD-7 scoring: encode Likert answers once, score and aggregate with NumPy
+
+import numpy as np
+import pandas as pd
+from survey_cache import SCORE_MAP
+
+MISSING = -1
+NEGATIVE_THRESHOLD = 10
+
+
+def encode_responses(frame, cols, score_map=SCORE_MAP):
+    """Encode the Likert columns into an (n_rows, n_cols) int8 matrix of item scores; missing is -1."""
+    codes = np.empty((len(frame), len(cols)), dtype=np.int8)
+    for j, col in enumerate(cols):
+        series = frame[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Translate category codes into scores so the category order does not matter
+            lookup = np.array([score_map.get(c, MISSING) for c in series.cat.categories] + [MISSING], dtype=np.int8)
+            codes[:, j] = lookup[series.cat.codes.to_numpy()]
+        else:
+            codes[:, j] = series.map(score_map).fillna(MISSING).to_numpy(dtype=np.int8)
+    return codes
+
+
+def instrument_scores(codes, item_counts):
+    """Sum the item scores of consecutive instruments in one pass; missing items count as 0."""
+    starts = np.concatenate(([0], np.cumsum(item_counts)[:-1]))
+    return np.add.reduceat(np.maximum(codes, 0, dtype=np.int16), starts, axis=1)
+
+
+def encode_groups(series):
+    """Return (int codes, labels) for a grouping column, -1 where the value is missing."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    codes, labels = pd.factorize(series, sort=True)
+    return codes, labels
+
+
+def count_by_group(group_codes, n_groups, negative):
+    """Return per-group respondent totals and an (n_groups, n_instruments) matrix of negative counts."""
+    valid = group_codes >= 0
+    keys = group_codes[valid]
+    totals = np.bincount(keys, minlength=n_groups)
+    counts = np.column_stack([np.bincount(keys, weights=negative[valid, i], minlength=n_groups)
+                              for i in range(negative.shape[1])]).astype(np.int64)
+    return totals, counts
+
+
+def summary_frame(labels, totals, counts, names, label_col):
+    """Turn group totals/counts into the summary table; groups with no respondents are dropped."""
+    observed = totals > 0
+    summary = pd.DataFrame({label_col: np.asarray(labels)[observed], 'Total_Respondents': totals[observed]})
+    for i, name in enumerate(names):
+        summary[name + '_Negative_Count'] = counts[observed, i]
+    for name in names:
+        summary[name + '_Negative_Percent'] = (summary[name + '_Negative_Count'] / summary['Total_Respondents']) * 100
+    return summary
+
+
+def negative_flags(frame, phq9_cols, gad7_cols, phq9_threshold=NEGATIVE_THRESHOLD, gad7_threshold=NEGATIVE_THRESHOLD):
+    """Score both instruments and return the (n_rows, 2) PHQ-9/GAD-7 threshold matrix."""
+    codes = encode_responses(frame, list(phq9_cols) + list(gad7_cols))
+    scores = instrument_scores(codes, [len(phq9_cols), len(gad7_cols)])
+    return scores >= np.array([phq9_threshold, gad7_threshold], dtype=np.int16)
+
+
+def score_by_state(frame, phq9_cols, gad7_cols, state_col, phq9_threshold=NEGATIVE_THRESHOLD,
+                   gad7_threshold=NEGATIVE_THRESHOLD):
+    """Build the per-state PHQ-9/GAD-7 negative summary used by the choropleth."""
+    negative = negative_flags(frame, phq9_cols, gad7_cols, phq9_threshold, gad7_threshold)
+    group_codes, labels = encode_groups(frame[state_col])
+    totals, counts = count_by_group(group_codes, len(labels), negative)
+    return summary_frame(labels, totals, counts, ['PHQ9', 'GAD7'], state_col)
+
+
+def score_histogram(group_codes, n_groups, scores, n_levels):
+    """Respondent counts per group and score combination, shaped (n_groups, *n_levels).
+
+    `scores` is an (n_rows, n_instruments) array of non-negative integer scores; rows with a missing
+    group or score (< 0) are skipped. Any threshold can then be applied with `counts_at_threshold`
+    without going back to the rows.
+    """
+    valid = (group_codes >= 0) & (scores >= 0).all(axis=1)
+    shape = (n_groups, *n_levels)
+    flat = np.ravel_multi_index((group_codes[valid], *scores[valid].T), shape)
+    return np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape)
+
+
+def counts_at_threshold(histogram, thresholds):
+    """Per-group totals and the (n_groups, n_instruments) counts scoring >= each threshold."""
+    totals = histogram.reshape(len(histogram), -1).sum(axis=1)
+    counts = []
+    for axis, threshold in enumerate(thresholds, start=1):
+        per_score = histogram.sum(axis=tuple(other for other in range(1, histogram.ndim) if other != axis))
+        counts.append(per_score[:, max(int(threshold), 0):].sum(axis=1))
+    return totals, np.column_stack(counts).astype(np.int64)
@@ -0,0 +1,82 @@
+# section_cache.py
+# On-disk cache of rendered report sections, keyed on everything a section depends on:
+# its data files, its run parameters and the code that produces it
+
+import hashlib
+import inspect
+import json
+import os
+import plotly
+from plotly.offline import get_plotlyjs_version
+import aggregates
+import platforms
+import report
+import scoring
+import survey_cache
+from survey_cache import CACHE_DIR, read_json, source_digest, write_json
+
+SECTION_CACHE_DIR = os.path.join(CACHE_DIR, 'sections')
+KEYS_NAME = 'keys.json'
+
+# Modules that turn the data files into report tables; editing one invalidates every data section
+PIPELINE_MODULES = [survey_cache, scoring, platforms, aggregates]
+
+
+def _code_digest(section):
+    """Source of the section's build/render functions and figure serialization, plus the shared table code."""
+    parts = [inspect.getsource(func) for func in (section.build, section.render) if func is not None]
+    if section.build is not None:
+        parts += [inspect.getsource(func) for func in (report.render_section, report.lazy_figure_html, report.typed_arrays)]
+    if section.sources:
+        parts += [inspect.getsource(report.prepare_tables), inspect.getsource(report.make_pivot)]
+        parts += [source_digest(module.__file__) for module in PIPELINE_MODULES]
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+
+def section_keys(params):
+    """Cache key of every section for this run's `params` (a superset of each section's `params`)."""
+    keys = {}
+    for section in report.SECTIONS:
+        spec = {
+            'section': section.name,
+            'sources': {path: source_digest(path) for path in section.sources},
+            'params': {name: params[name] for name in section.params},
+            'plotlyjs': section.plotlyjs,
+            'code': _code_digest(section),
+            # Fragments from another plotly release must not be mixed with the plotly.js tag of this one
+            'plotly': [plotly.__version__, get_plotlyjs_version()],
+        }
+        keys[section.name] = hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+    return keys
+
+
+def _fragment_path(name, cache_dir):
+    return os.path.join(cache_dir, name + '.html')
+
+
+def load_fragments(keys, cache_dir=SECTION_CACHE_DIR):
+    """Return {name: fragment} for the sections whose cached fragment still matches its key."""
+    stored = read_json(os.path.join(cache_dir, KEYS_NAME))
+    fragments = {}
+    for name, key in keys.items():
+        if stored.get(name) != key:
+            continue
+        try:
+            with open(_fragment_path(name, cache_dir)) as f:
+                fragments[name] = f.read()
+        except OSError:
+            pass
+    return fragments
+
+
+def store_fragments(fragments, keys, cache_dir=SECTION_CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    keys_path = os.path.join(cache_dir, KEYS_NAME)
+    stored = read_json(keys_path)
+    for name, fragment in fragments.items():
+        tmp = _fragment_path(name, cache_dir) + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(fragment)
+        os.replace(tmp, _fragment_path(name, cache_dir))
+        stored[name] = keys[name]
+    write_json(keys_path, stored)
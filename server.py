@@ -0,0 +1,207 @@
+# server.py
+# Local report server: the surveys are loaded and encoded once into per-group score histograms, and
+# any section is re-rendered on demand for a census region and PHQ-9/GAD-7 or smmh thresholds
+#
+#   python SocialMediaVisualizations.py --serve --port 8000
+#   GET /?region=South&phq9_threshold=15                 whole page
+#   GET /section/conclusion?anxiety_threshold=5          one section's fragment
+#   GET /rollout/states?region=West                      Facebook rollout vs enrollment per state (JSON)
+#   GET /rollout/institutions?state=CA                   the same per institution (JSON)
+
+import functools
+import time
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+import pandas as pd
+from aggregates import ANXIETY_THRESHOLD, DEPRESSION_THRESHOLD, aggregate_smmh
+from joins import facebook_institutions, load_institutions, state_rollup
+from report import OUTPUT_MODES, SECTIONS, page_html, prepare_tables, render_section
+from scoring import (MISSING, NEGATIVE_THRESHOLD, counts_at_threshold, encode_groups, encode_responses,
+                     instrument_scores, score_histogram, summary_frame)
+from survey_cache import (ANXIETY_COL, DEPRESSION_COL, MENTAL_HEALTH_PATH, PLATFORM_COL, SMMH_PATH, STATE_COL, TIME_COL,
+                          likert_columns, load_census_regions, load_mental_health, load_smmh)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+SECTION_CACHE_SIZE = 256
+STYLESHEET = 'styles.css'
+
+SMMH_COLS = (TIME_COL, PLATFORM_COL, DEPRESSION_COL, ANXIETY_COL)
+SECTION_INDEX = {section.name: index for index, section in enumerate(SECTIONS)}
+
+# Thresholds a request may override, by their Section.params name; a section's cache key only
+# carries the ones in its own params
+THRESHOLDS = {'phq9_threshold': NEGATIVE_THRESHOLD, 'gad7_threshold': NEGATIVE_THRESHOLD,
+              'anxiety_threshold': ANXIETY_THRESHOLD, 'depression_threshold': DEPRESSION_THRESHOLD}
+
+ServerData = namedtuple('ServerData', ['census_regions', 'states', 'state_regions', 'state_histogram',
+                                       'smmh_tables', 'time_labels', 'smmh_histogram', 'state_rollout',
+                                       'institution_rollout'])
+
+
+def load_server_data():
+    """Load and encode both surveys once.
+
+    The mental health survey is reduced to a (state, PHQ-9 score, GAD-7 score) histogram and the
+    smmh conclusion counts to a (time bin, depression, anxiety) histogram, so a new threshold or
+    region never touches the rows again. The threshold-free smmh tables and the Facebook rollout
+    tables from joins.py are built up front.
+    """
+    census_regions = load_census_regions()
+    mental_health = load_mental_health()
+    likert_cols = likert_columns(mental_health)
+    item_counts = [9, len(likert_cols) - 9]
+    scores = instrument_scores(encode_responses(mental_health, likert_cols), item_counts)
+    state_codes, states = encode_groups(mental_health[STATE_COL])
+    state_histogram = score_histogram(state_codes, len(states), scores, [3 * n + 1 for n in item_counts])
+    states = np.asarray(states)
+    state_regions = pd.Series(states).map(census_regions.set_index('State')['Region']).to_numpy()
+
+    smmh = load_smmh()[list(SMMH_COLS)]
+    smmh_tables = aggregate_smmh([smmh], *SMMH_COLS)
+    time_codes, time_labels = encode_groups(smmh[TIME_COL])
+    severity = np.column_stack([smmh[col].to_numpy(dtype=float) for col in (DEPRESSION_COL, ANXIETY_COL)])
+    severity = np.where(np.isnan(severity), MISSING, severity).astype(np.int64)
+    smmh_histogram = score_histogram(time_codes, len(time_labels), severity, tuple(severity.max(axis=0) + 1))
+
+    institutions = load_institutions()
+    institution_rollout = facebook_institutions(institutions).reset_index()
+    institution_rollout['Region'] = institution_rollout['stabbr'].map(census_regions.set_index('State Code')['Region'])
+    return ServerData(census_regions, states, state_regions, state_histogram, smmh_tables, np.asarray(time_labels),
+                      smmh_histogram, state_rollup(institutions, census_regions), institution_rollout)
+
+
+def state_summary(data, region, phq9_threshold, gad7_threshold):
+    """`scoring.score_by_state` for the states in `region` (all states when None)."""
+    keep = np.ones(len(data.states), dtype=bool) if region is None else data.state_regions == region
+    totals, counts = counts_at_threshold(data.state_histogram[keep], [phq9_threshold, gad7_threshold])
+    return summary_frame(data.states[keep], totals, counts, ['PHQ9', 'GAD7'], STATE_COL)
+
+
+def conclusion_summary(data, anxiety_threshold, depression_threshold):
+    """The `conclusion_summary` table of `aggregates.aggregate_smmh` for any thresholds."""
+    totals, counts = counts_at_threshold(data.smmh_histogram, [depression_threshold, anxiety_threshold])
+    observed = totals > 0
+    summary = pd.DataFrame({TIME_COL: data.time_labels[observed], 'Total_Respondents': totals[observed],
+                            'GAD7_Negative': counts[observed, 1], 'PHQ9_Negative': counts[observed, 0]})
+    summary['Anxiety_Rate'] = (summary['GAD7_Negative'] / summary['Total_Respondents']) * 100
+    summary['Depression_Rate'] = (summary['PHQ9_Negative'] / summary['Total_Respondents']) * 100
+    summary.attrs = {'anxiety_threshold': anxiety_threshold, 'depression_threshold': depression_threshold}
+    return summary
+
+
+def section_tables(data, section, region, thresholds):
+    """The prepare_tables() entries `section` reads, for this request's filters and thresholds."""
+    params = {**THRESHOLDS, **thresholds}
+    summary = smmh_tables = None
+    if MENTAL_HEALTH_PATH in section.sources:
+        summary = state_summary(data, region, params['phq9_threshold'], params['gad7_threshold'])
+    if SMMH_PATH in section.sources:
+        smmh_tables = dict(data.smmh_tables, conclusion_summary=conclusion_summary(
+            data, params['anxiety_threshold'], params['depression_threshold']))
+    return prepare_tables(summary, data.census_regions, smmh_tables)
+
+
+def section_renderer(data, cache_size=SECTION_CACHE_SIZE):
+    """Fragment renderer with an LRU cache on (section, output, region, thresholds)."""
+    @functools.lru_cache(maxsize=cache_size)
+    def render(name, output, region, thresholds):
+        index = SECTION_INDEX[name]
+        fragment, _ = render_section(index, section_tables(data, SECTIONS[index], region, dict(thresholds)), output)
+        return fragment
+    return render
+
+
+def request_output(query, default):
+    output = query.get('output', default)
+    if output not in OUTPUT_MODES:
+        raise ValueError(f"output must be one of {', '.join(OUTPUT_MODES)}")
+    return output
+
+
+def section_request(section, query, output, regions):
+    """Normalized render() arguments: filters and thresholds the section does not depend on are dropped,
+    so e.g. every region shares one cached heatmap."""
+    region = query.get('region') if MENTAL_HEALTH_PATH in section.sources else None
+    if region is not None and region not in regions:
+        raise ValueError(f"region must be one of {', '.join(regions)}")
+    try:
+        thresholds = tuple((name, int(query[name])) for name in THRESHOLDS if name in section.params and name in query)
+    except ValueError:
+        raise ValueError('thresholds must be integers')
+    return section.name, output, region, thresholds
+
+
+def rollout_json(data, table, query, regions):
+    """Facebook rollout `table` ('states' or 'institutions') filtered by `region` and, per institution, `state`."""
+    rows = data.state_rollout if table == 'states' else data.institution_rollout
+    region = query.get('region')
+    if region is not None:
+        if region not in regions:
+            raise ValueError(f"region must be one of {', '.join(regions)}")
+        rows = rows[rows['Region'] == region]
+    if table == 'institutions' and 'state' in query:
+        rows = rows[rows['stabbr'] == query['state'].upper()]
+    return rows.to_json(orient='records', date_format='iso')
+
+
+class ReportHandler(BaseHTTPRequestHandler):
+    """GET / for the whole page, /section/<name> for one fragment, /rollout/<states|institutions> for the
+    Facebook rollout tables and /styles.css for the page's stylesheet."""
+
+    def do_GET(self):
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        server = self.server
+        try:
+            if url.path == '/':
+                output = request_output(query, server.output)
+                fragments = {section.name: server.render(*section_request(section, query, output, server.regions))
+                             for section in SECTIONS}
+                body, content_type = page_html(fragments, output), 'text/html'
+            elif url.path.startswith('/section/') and url.path[len('/section/'):] in SECTION_INDEX:
+                section = SECTIONS[SECTION_INDEX[url.path[len('/section/'):]]]
+                output = request_output(query, server.output)
+                body, content_type = server.render(*section_request(section, query, output, server.regions)), 'text/html'
+            elif url.path in ('/rollout/states', '/rollout/institutions'):
+                body, content_type = rollout_json(server.data, url.path[len('/rollout/'):], query, server.regions), 'application/json'
+            elif url.path == '/' + STYLESHEET:
+                with open(STYLESHEET) as f:
+                    body, content_type = f.read(), 'text/css'
+            else:
+                self.send_error(404)
+                return
+        except ValueError as error:
+            self.send_error(400, str(error))
+            return
+        payload = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type + '; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('Server-Timing', f'render;dur={(time.perf_counter() - start) * 1000:.1f}')
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, output='inline', cache_size=SECTION_CACHE_SIZE):
+    """Load the data once, warm the cache with the default page and serve until interrupted."""
+    start = time.perf_counter()
+    data = load_server_data()
+    server = ThreadingHTTPServer((host, port), ReportHandler)
+    server.data = data
+    server.output = output
+    server.regions = list(data.census_regions['Region'].unique())
+    server.render = section_renderer(data, cache_size)
+    for section in SECTIONS:
+        server.render(*section_request(section, {}, output, server.regions))
+    print(f"Loaded and encoded the surveys in {time.perf_counter() - start:.2f}s; "
+          f"serving the report on http://{host}:{server.server_port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,93 @@
+# stages.py
+# Stage instrumentation for a report run: wall time, peak RSS, rows in/out and output size per named
+# stage, optional cProfile / tracemalloc dumps, all collected into a JSON run manifest
+
+import cProfile
+import datetime
+import os
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager
+from survey_cache import write_json
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Per-stage dumps are written to `directory` as <stage>.prof and <stage>.tracemalloc.txt
+ProfileOptions = namedtuple('ProfileOptions', ['directory', 'cprofile', 'tracemalloc'])
+
+TRACEMALLOC_TOP = 40
+
+
+def max_rss_bytes():
+    """Peak resident set size of this process so far, in bytes (None where unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+@contextmanager
+def profiled(name, options):
+    """Run the block under cProfile and/or tracemalloc when `options` asks for it."""
+    if options is None or not (options.cprofile or options.tracemalloc):
+        yield
+        return
+    os.makedirs(options.directory, exist_ok=True)
+    profiler = cProfile.Profile() if options.cprofile else None
+    if options.tracemalloc:
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(options.directory, name + '.prof'))
+        if options.tracemalloc:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            with open(os.path.join(options.directory, name + '.tracemalloc.txt'), 'w') as f:
+                f.write(f'peak traced memory: {peak} bytes\n')
+                for stat in snapshot.statistics('lineno')[:TRACEMALLOC_TOP]:
+                    f.write(f'{stat}\n')
+
+
+class RunManifest:
+    """Collects one record per stage and writes them, with run metadata, as a JSON manifest."""
+
+    def __init__(self, profile=None):
+        self.profile = profile
+        self.started = datetime.datetime.now(datetime.timezone.utc)
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name, **fields):
+        """Time a named stage; the block may set `rows_in`, `rows_out` or `output_bytes` on the yielded record."""
+        record = {'name': name, **fields}
+        start = time.perf_counter()
+        with profiled(name, self.profile):
+            yield record
+        record['seconds'] = time.perf_counter() - start
+        record['max_rss_bytes'] = max_rss_bytes()
+        self.stages.append(record)
+
+    def add(self, record):
+        self.stages.append(record)
+
+    def write(self, path, **fields):
+        manifest = {
+            'started_at': self.started.isoformat(),
+            'seconds': (datetime.datetime.now(datetime.timezone.utc) - self.started).total_seconds(),
+            'max_rss_bytes': max_rss_bytes(),
+            **fields,
+            'stages': self.stages,
+        }
+        write_json(path, manifest)
+        return manifest
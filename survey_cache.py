@@ -0,0 +1,200 @@
+# survey_cache.py
+# Loader layer for the survey CSVs: cleaned, typed frames cached on disk as Parquet
+
+import hashlib
+import json
+import os
+import pandas as pd
+
+CACHE_DIR = 'cache'
+CACHE_VERSION = 1  # bump whenever the cleaning below changes so stale entries are rebuilt
+MANIFEST_NAME = 'manifest.json'
+DIGESTS_NAME = 'digests.json'
+
+MENTAL_HEALTH_PATH = 'data/MentalHealthSurvey/Mental_Health_Survey_Feb_20_22.csv'
+SMMH_PATH = 'data/smmh.csv'
+CENSUS_REGIONS_PATH = 'data/USCensusBureau_RegionsAndDivisions.csv'
+
+# Columns the report reads
+STATE_COL = 'In which state do you live? - State'
+PLATFORM_COL = '7. What social media platforms do you commonly use?'
+TIME_COL = '8. What is the average time you spend on social media every day?'
+DEPRESSION_COL = '18. How often do you feel depressed or down?'
+ANXIETY_COL = '13. On a scale of 1 to 5, how much are you bothered by worries?'
+TIME_ORDER = ['Less than an Hour', 'Between 1 and 2 hours', 'Between 2 and 3 hours',
+              'Between 3 and 4 hours', 'Between 4 and 5 hours', 'More than 5 hours']
+
+SCORE_MAP = {"Not at all": 0, "Several days": 1, "More than half of the days": 2, "Nearly every day": 3}
+LIKERT_DTYPE = pd.CategoricalDtype(list(SCORE_MAP), ordered=True)
+
+
+def likert_columns(frame):
+    """Labels of the Likert-coded (PHQ-9 / GAD-7) columns, in survey order."""
+    return [col for col, dtype in frame.dtypes.items() if dtype == LIKERT_DTYPE]
+
+
+def file_fingerprint(path):
+    """Return the (size, mtime_ns) pair used as the cheap first-pass cache key."""
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def file_hash(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _typed(col, likert_aware=False):
+    # Likert answers become an ordered categorical; anything outside the vocabulary is NaN,
+    # which is what the original `.map(score_map)` produced for it.
+    values = col.dropna()
+    if likert_aware and values.isin(SCORE_MAP.keys()).any():
+        return col.astype(LIKERT_DTYPE)
+    numeric = pd.to_numeric(values, errors='coerce')
+    if len(values) and numeric.notna().all():
+        return pd.to_numeric(col, downcast='integer') if col.notna().all() else pd.to_numeric(col, downcast='float')
+    if values.nunique() <= max(len(values) // 2, 1):
+        return col.astype('category')
+    return col
+
+
+def _clean_mental_health(path):
+    # Qualtrics export: row 0 holds the question text, row 1 the ImportId JSON.
+    # The question text repeats (e.g. "Timing - First Click"), so the cache keeps the unique
+    # export header and the question labels are restored on load.
+    raw = pd.read_csv(path, dtype=str)
+    labels = raw.iloc[0].tolist()
+    clean = raw.iloc[2:].reset_index(drop=True)
+    clean = pd.DataFrame({name: _typed(clean[name], likert_aware=True) for name in clean.columns})
+    return clean, labels
+
+
+def _clean_plain(path):
+    raw = pd.read_csv(path)
+    return pd.DataFrame({name: _typed(raw[name]) for name in raw.columns}), None
+
+
+def read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def source_digest(path, cache_dir=CACHE_DIR):
+    """sha256 of `path`, re-hashed only when its size or mtime moved since the last call."""
+    digests_path = os.path.join(cache_dir, DIGESTS_NAME)
+    digests = read_json(digests_path)
+    size, mtime_ns = file_fingerprint(path)
+    entry = digests.get(path)
+    if entry and entry['size'] == size and entry['mtime_ns'] == mtime_ns:
+        return entry['sha256']
+    digests[path] = {'size': size, 'mtime_ns': mtime_ns, 'sha256': file_hash(path)}
+    write_json(digests_path, digests)
+    return digests[path]['sha256']
+
+
+def _is_fresh(entry, path, cache_file):
+    """Compare the stored fingerprint with the source; only hash when size matches but mtime moved."""
+    if not entry or entry.get('version') != CACHE_VERSION or not os.path.exists(cache_file):
+        return False
+    size, mtime_ns = file_fingerprint(path)
+    if entry['size'] != size:
+        return False
+    if entry['mtime_ns'] == mtime_ns:
+        return True
+    if entry['sha256'] != file_hash(path):
+        return False
+    entry['mtime_ns'] = mtime_ns  # touched but unchanged: refresh the cheap key
+    return True
+
+
+def load_cached(name, path, clean, cache_dir=CACHE_DIR):
+    """Return the cleaned frame for `path`, rebuilding its cache entry only if the source changed.
+
+    Falls back to cleaning the CSV directly when no Parquet engine is installed.
+    """
+    cache_file = os.path.join(cache_dir, name + '.parquet')
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    manifest = read_json(manifest_path)
+    entry = manifest.get(name)
+    known_mtime = entry.get('mtime_ns') if entry else None
+    try:
+        if _is_fresh(entry, path, cache_file):
+            frame = pd.read_parquet(cache_file)
+            if entry['mtime_ns'] != known_mtime:
+                write_json(manifest_path, manifest)
+            if entry.get('labels') is not None:
+                frame.columns = entry['labels']
+            return frame
+    except ImportError:
+        pass
+    frame, labels = clean(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = cache_file + '.tmp'
+        frame.to_parquet(tmp, index=False)
+        os.replace(tmp, cache_file)
+    except ImportError:
+        pass
+    else:
+        size, mtime_ns = file_fingerprint(path)
+        manifest[name] = {'source': path, 'size': size, 'mtime_ns': mtime_ns, 'sha256': file_hash(path),
+                          'version': CACHE_VERSION, 'labels': labels}
+        write_json(manifest_path, manifest)
+    if labels is not None:
+        frame.columns = labels
+    return frame
+
+
+def load_derived(name, paths, build, version, cache_dir=CACHE_DIR):
+    """Return `build()`, a frame joined from several source files, cached until any of `paths` or `version` changes.
+
+    Unlike `load_cached` the frame's index is stored too.
+    """
+    cache_file = os.path.join(cache_dir, name + '.parquet')
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    sources = {path: source_digest(path, cache_dir) for path in paths}
+    manifest = read_json(manifest_path)
+    entry = manifest.get(name)
+    try:
+        if entry and entry['sources'] == sources and entry['version'] == version and os.path.exists(cache_file):
+            return pd.read_parquet(cache_file)
+    except ImportError:
+        pass
+    frame = build()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = cache_file + '.tmp'
+        frame.to_parquet(tmp)
+        os.replace(tmp, cache_file)
+    except ImportError:
+        pass
+    else:
+        manifest[name] = {'sources': sources, 'version': version}
+        write_json(manifest_path, manifest)
+    return frame
+
+
+def load_mental_health(path=MENTAL_HEALTH_PATH, cache_dir=CACHE_DIR):
+    return load_cached('mental_health', path, _clean_mental_health, cache_dir)
+
+
+def load_smmh(path=SMMH_PATH, cache_dir=CACHE_DIR):
+    return load_cached('smmh', path, _clean_plain, cache_dir)
+
+
+def load_census_regions(path=CENSUS_REGIONS_PATH, cache_dir=CACHE_DIR):
+    return load_cached('census_regions', path, _clean_plain, cache_dir)